@@ -2,34 +2,85 @@
 import re
 import datetime
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import git_provider
+import settings
 import error
 
+# Результаты успешных проверок: имя репозитория или пара (репозиторий, ветка)
+_validation_cache = set()
+
 
 class AnalyticsSet:
     """
     Класс объекта запроса
     """
 
-    def __init__(self, url, time_start=None, time_stop=None, branch="master"):
-        self.repo = self._url_validator(url)
+    def __init__(self, url, time_start=None, time_stop=None, branch="master", lazy=None):
+        self.repo = self._repo_name_extractor(url)
         self.time = self._time_validator(time_start, time_stop)
-        self.branch = self._branch_validator(branch)
+        self.branch = branch
+        self.lazy = settings.LAZY_VALIDATION if lazy is None else lazy
+        if not self.lazy:
+            self._validate()
+
+    def _validate(self):
+        """
+        Функция проверки существования репозитория и ветки.
+        Проверки выполняются параллельно, успешные результаты кэшируются
+        :return:
+        """
+        if self.repo in _validation_cache and (self.repo, self.branch) in _validation_cache:
+            return
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            repo_check = executor.submit(self._repo_validator)
+            branch_check = executor.submit(self._branch_validator)
+            repo_check.result()
+            branch_check.result()
+
+    def _run(self, func, *args):
+        """
+        Функция запуска сбора статистики. В ленивом режиме отдельные проверки не выполняются,
+        их заменяет сам запрос данных: при ответе 404 проверки запускаются для сообщения
+        о причине ошибки. Ветка проверяется только в get_top_contrib: статистика
+        по pull requests и issues от ветки не зависит и в ленивом режиме ее не проверяет
+        :param func: function
+        :return:
+        """
+        if not self.lazy:
+            return func(*args)
+        try:
+            ans = func(*args)
+        except error.NotFoundError:
+            self._validate()
+            raise
+        _validation_cache.add(self.repo)
+        return ans
 
-    def _url_validator(self, url):
+    def _repo_name_extractor(self, url):
         """
-        Функция валидирования введенного url
+        Функция извлечения имени репозитория из введенного url
         :param url: string
         :return: string
         """
         pattern = r"\/\w+\/\w+\/$"
-        ans = re.search(pattern, url).group().strip("/")
-        resp = git_provider.Request(ans)
-        if resp.get_http_status() == 200:
-            return ans
-        else:
+        return re.search(pattern, url).group().strip("/")
+
+    def _repo_validator(self):
+        """
+        Функция проверки существования репозитория
+        :return:
+        """
+        if self.repo in _validation_cache:
+            return
+        try:
+            resp = git_provider.Request(self.repo, method="HEAD")
+        except error.NotFoundError:
+            raise error.InputDataError("Неверный url")
+        if resp.get_http_status() != 200:
             raise error.InputDataError("Неверный url")
+        _validation_cache.add(self.repo)
 
     def _time_validator(self, time_start, time_stop):
         """
@@ -46,18 +97,21 @@ class AnalyticsSet:
         time = namedtuple("Time", "start stop")
         return time(time_start, time_stop)
 
-    def _branch_validator(self, branch):
+    def _branch_validator(self):
         """
-        Функция валидирования ветки репозитория
-        :param branch: string
-        :return: string
+        Функция проверки существования ветки репозитория
+        :return:
         """
-        url = "{0}{1}{2}".format(self.repo, "/branches/", branch)
-        req = git_provider.Request(url)
-        if req.get_http_status() == 200:
-            return branch
-        else:
+        if (self.repo, self.branch) in _validation_cache:
+            return
+        url = "{0}{1}{2}".format(self.repo, "/branches/", self.branch)
+        try:
+            req = git_provider.Request(url, method="HEAD")
+        except error.NotFoundError:
             raise error.InputDataError("Данная ветка отсутствует")
+        if req.get_http_status() != 200:
+            raise error.InputDataError("Данная ветка отсутствует")
+        _validation_cache.add((self.repo, self.branch))
 
     def get_top_contrib(self):
         """
@@ -65,7 +119,14 @@ class AnalyticsSet:
         :return: list of tuples
         """
         data = TopContributors(self.repo, self.time, branch=self.branch)
-        return data.get_sorted_set()
+        ans = self._run(data.get_sorted_set)
+        if self.lazy:
+            # Запросы коммитов с sha=branch проверили ветку. Без контрибьюторов их не было
+            if ans:
+                _validation_cache.add((self.repo, self.branch))
+            else:
+                self._branch_validator()
+        return ans
 
     def get_pulls_statistics(self, border):
         """
@@ -74,7 +135,7 @@ class AnalyticsSet:
         :return: tuple
         """
         data = PullsAnalytics(self.repo, self.time, branch=self.branch)
-        return data.get_pulls_stat(border)
+        return self._run(data.get_pulls_stat, border)
 
     def get_issues_statistics(self, border):
         """
@@ -83,7 +144,7 @@ class AnalyticsSet:
         :return: tuple
         """
         data = IssueAnalytics(self.repo, self.time, branch=self.branch)
-        return data.get_issues_stat(border)
+        return self._run(data.get_issues_stat, border)
 
 
 class BaseAnalyticParamClass:
@@ -281,6 +342,15 @@ class PullsAnalytics(BaseAnalyticParamClass):
         dict_pull_classified["closed_all"] = self._get_qty(url, "closed")
         return dict_pull_classified
 
+    def get_pulls(self, state):
+        """
+        Функция получения всех pull requests в указанном состоянии
+        :param state: string
+        :return: list of dicts
+        """
+        url = "{0}{1}".format(self.repo, "/pulls")
+        return self._get_all(url, state)
+
     def get_pulls_stat(self, border):
         """
         Функция получения статистики по pull requests
@@ -328,6 +398,16 @@ class IssueAnalytics(BaseAnalyticParamClass):
         dict_issue_classified["closed_all"] = self._get_qty(url, "closed")
         return dict_issue_classified
 
+    def get_issues(self, state):
+        """
+        Функция получения всех issues в указанном состоянии.
+        Api отдает в /issues и pull requests, они отбрасываются
+        :param state: string
+        :return: list of dicts
+        """
+        url = "{0}{1}".format(self.repo, "/issues")
+        return [i for i in self._get_all(url, state) if "pull_request" not in i]
+
     def get_issues_stat(self, border):
         """
         Функция получения статистики по Issues
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import mmap
+import zlib
+import threading
+
+import error
+
+# Версия формата архива, записывается первой строкой индекса.
+# Архивы без версии записаны без метода запроса в ключе и не читаются
+ARCHIVE_VERSION = 2
+
+
+def check_version(header_line, path):
+    """
+    Функция проверки версии формата архива по первой строке индекса
+    :param header_line: string
+    :param path: string
+    :return:
+    """
+    try:
+        version = json.loads(header_line).get("version")
+    except (ValueError, AttributeError):
+        version = None
+    if version != ARCHIVE_VERSION:
+        raise error.InputDataError(
+            "Архив {0} записан в неподдерживаемом формате, запишите его заново".format(path)
+        )
+
+
+def make_key(method, url, dict_param):
+    """
+    Функция получения ключа записи по методу, url и параметрам запроса
+    :param method: string
+    :param url: string
+    :param dict_param: dict or None
+    :return: string
+    """
+    return json.dumps([method, url, dict_param or {}], sort_keys=True)
+
+
+class ArchiveWriter:
+    """
+    Класс записи ответов api в архив.
+    Архив состоит из файла данных со сжатыми записями и индекса path.idx
+    с версией формата и смещениями записей (по одной json строке на запись)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index_path = "{0}.idx".format(path)
+        if os.path.exists(index_path) and os.path.getsize(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                check_version(f.readline(), path)
+        self.data_file = open(path, "ab")
+        self.index_file = open(index_path, "a", encoding="utf-8")
+        if self.index_file.tell() == 0:
+            self.index_file.write(json.dumps({"version": ARCHIVE_VERSION}) + "\n")
+            self.index_file.flush()
+        self.lock = threading.Lock()
+
+    def write(self, method, url, dict_param, status, headers, body):
+        """
+        Функция добавления ответа в архив
+        :param method: string
+        :param url: string
+        :param dict_param: dict or None
+        :param status: int
+        :param headers: dict
+        :param body: string
+        :return:
+        """
+        record = {
+            "method": method,
+            "url": url,
+            "params": dict_param,
+            "status": status,
+            "headers": headers,
+            "body": body,
+        }
+        compressed = zlib.compress(json.dumps(record).encode("utf-8"))
+        with self.lock:
+            self.data_file.seek(0, os.SEEK_END)
+            offset = self.data_file.tell()
+            self.data_file.write(compressed)
+            self.data_file.flush()
+            entry = {"key": make_key(method, url, dict_param), "offset": offset, "length": len(compressed)}
+            self.index_file.write(json.dumps(entry) + "\n")
+            self.index_file.flush()
+
+    def close(self):
+        self.data_file.close()
+        self.index_file.close()
+
+
+class ArchiveReader:
+    """
+    Класс чтения ответов api из архива через отображение файла в память
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = self._load_index()
+        try:
+            self.data_file = open(path, "rb")
+        except FileNotFoundError:
+            raise error.InputDataError("Архив запросов не найден: {0}".format(path))
+        if os.fstat(self.data_file.fileno()).st_size:
+            self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = b""
+
+    def _load_index(self):
+        """
+        Функция загрузки индекса архива. При повторной записи ключа берется последняя
+        :return: dict
+        """
+        index = {}
+        try:
+            with open("{0}.idx".format(self.path), "r", encoding="utf-8") as f:
+                check_version(f.readline(), self.path)
+                for line in f:
+                    entry = json.loads(line)
+                    index[entry["key"]] = (entry["offset"], entry["length"])
+        except FileNotFoundError:
+            raise error.InputDataError("Архив запросов не найден: {0}".format(self.path))
+        return index
+
+    def read(self, method, url, dict_param):
+        """
+        Функция получения записанного ответа
+        :param method: string
+        :param url: string
+        :param dict_param: dict or None
+        :return: dict
+        """
+        position = self.index.get(make_key(method, url, dict_param))
+        if position is None:
+            raise error.InputDataError("Запрос отсутствует в архиве: {0}".format(url))
+        offset, length = position
+        return json.loads(zlib.decompress(self.data[offset:offset + length]).decode("utf-8"))
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data_file.close()
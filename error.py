@@ -9,3 +9,9 @@ class InputDataError(Exception):
 
     def __str__(self):
         return self.message
+
+
+class NotFoundError(InputDataError):
+    """
+    Класс ошибки отсутствующего ресурса (http 404)
+    """
@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 import re
+import json
+import threading
 import requests
 from requests.auth import AuthBase
+from requests.structures import CaseInsensitiveDict
 
 import settings
 import error
+import archive
+
+_archive = None
+_archive_lock = threading.Lock()
 
 
 class TokenAuth(requests.auth.AuthBase):
@@ -20,14 +27,44 @@ class TokenAuth(requests.auth.AuthBase):
         return r
 
 
+class ArchivedResponse:
+    """
+    Класс ответа, восстановленного из архива запросов
+    """
+
+    def __init__(self, record):
+        self.status_code = record["status"]
+        self.headers = CaseInsensitiveDict(record["headers"])
+        self.text = record["body"]
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def get_archive():
+    """
+    Функция получения архива запросов для текущего режима из settings.REQUEST_MODE
+    :return: ArchiveWriter or ArchiveReader or None
+    """
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            if settings.REQUEST_MODE == "record":
+                _archive = archive.ArchiveWriter(settings.ARCHIVE_PATH)
+            elif settings.REQUEST_MODE == "replay":
+                _archive = archive.ArchiveReader(settings.ARCHIVE_PATH)
+    return _archive
+
+
 class Request:
     """
     Класс запроса
     """
 
-    def __init__(self, url, dict_param=None):
+    def __init__(self, url, dict_param=None, method="GET"):
         self.url = self._url_creator(url)
         self.dict_param = dict_param
+        self.method = method
         self.resp = self._get_response()
 
     def get_data(self):
@@ -43,17 +80,42 @@ class Request:
         :return:
         """
         # Тут ее нужно еще конкретно доработать
+        if settings.REQUEST_MODE == "replay":
+            return self._get_archived_response()
         try:
             token = "token {0}".format(settings.TOKEN)
-            response = requests.get(
-                self.url, params=self.dict_param, auth=TokenAuth(token)
+            # HEAD запрос используется для проверок существования, тело ответа не скачивается
+            response = requests.request(
+                self.method, self.url, params=self.dict_param, auth=TokenAuth(token)
             )
+            if settings.REQUEST_MODE == "record":
+                get_archive().write(
+                    self.method, self.url, self.dict_param, response.status_code, dict(response.headers), response.text
+                )
             response.raise_for_status()
             return response
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                raise error.NotFoundError(str(e))
+            raise error.InputDataError(e)
         except requests.RequestException as e:
             # Тут по хорошему нужно отлавливать закончившиеся запросы и посылать это пользователю, мол попробуй позже
             raise error.InputDataError(e)
 
+    def _get_archived_response(self):
+        """
+        Функция получения ответа из архива без обращения к сети
+        :return: ArchivedResponse
+        """
+        response = ArchivedResponse(get_archive().read(self.method, self.url, self.dict_param))
+        if response.status_code == 404:
+            raise error.NotFoundError("404 Error for url: {0}".format(self.url))
+        if response.status_code >= 400:
+            raise error.InputDataError(
+                "{0} Error for url: {1}".format(response.status_code, self.url)
+            )
+        return response
+
     def _url_creator(self, url):
         """
         Класс создания url
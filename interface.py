@@ -186,6 +186,16 @@ class ConsoleInterface:
         top_contrib_data = analytic_set.get_top_contrib()
         pulls_statistics = analytic_set.get_pulls_statistics(settings.PULLS_BORDER)
         issue_statistics = analytic_set.get_issues_statistics(settings.ISSUES_BORDER)
+        self.statistic_render(top_contrib_data, pulls_statistics, issue_statistics)
+
+    def statistic_render(self, top_contrib_data, pulls_statistics, issue_statistics):
+        """
+        Отображение аналитики по репозиторию
+        :param top_contrib_data: list of tuples
+        :param pulls_statistics: tuple
+        :param issue_statistics: tuple
+        :return:
+        """
         self._contrib_render(top_contrib_data)
         self._pulls_statistics_render(pulls_statistics)
         self._issues_statistics_render(issue_statistics)
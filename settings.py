@@ -4,3 +4,11 @@ TOKEN = ""
 CONTRIB_LIMIT = 30
 PULLS_BORDER = 30
 ISSUES_BORDER = 14
+WEBHOOK_HOST = "127.0.0.1"
+WEBHOOK_PORT = 8080
+WEBHOOK_SECRET = ""
+WEBHOOK_STORAGE = "webhook_stats.json"
+WEBHOOK_DELIVERY_LIMIT = 10000
+REQUEST_MODE = ""
+ARCHIVE_PATH = "capture.arc"
+LAZY_VALIDATION = False
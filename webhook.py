@@ -0,0 +1,521 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import hmac
+import hashlib
+import datetime
+from collections import namedtuple
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import analytic
+import interface
+import settings
+import error
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Максимальное количество коммитов в массиве commits события push,
+# при достижении предела счетчики ветки требуют сверки
+PUSH_COMMITS_LIMIT = 2048
+
+
+def _file_lock(f):
+    """
+    Функция получения эксклюзивной блокировки файла, ждет освобождения
+    :param f: file
+    :return:
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _file_unlock(f):
+    """
+    Функция снятия блокировки файла
+    :param f: file
+    :return:
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class WebhookStorage:
+    """
+    Класс хранилища счетчиков статистики, обновляемых событиями webhook
+    """
+
+    def __init__(self, path=None):
+        self.path = path if path is not None else settings.WEBHOOK_STORAGE
+        self._reload()
+
+    def _reload(self):
+        """
+        Функция перечитывания счетчиков с диска
+        :return:
+        """
+        self.data = self._load()
+        self.deliveries = set(self.data["deliveries"])
+
+    @contextmanager
+    def transaction(self):
+        """
+        Изменение счетчиков под блокировкой файла: данные перечитываются с диска,
+        после изменения сохраняются. Сервер и сверка в разных процессах
+        не перезаписывают изменения друг друга
+        :return:
+        """
+        with open("{0}.lock".format(self.path), "a") as lock_file:
+            _file_lock(lock_file)
+            try:
+                self._reload()
+                yield self
+                self.save()
+            finally:
+                _file_unlock(lock_file)
+
+    def _load(self):
+        """
+        Функция загрузки сохраненных счетчиков
+        :return: dict
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"repos": {}, "deliveries": []}
+        except ValueError:
+            raise error.InputDataError("Файл счетчиков поврежден: {0}".format(self.path))
+
+    def save(self):
+        """
+        Функция сохранения счетчиков на диск через временный файл
+        :return:
+        """
+        tmp_path = "{0}.tmp".format(self.path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def has_repo(self, repo):
+        """
+        Функция проверки наличия счетчиков репозитория
+        :param repo: string
+        :return: bool
+        """
+        return repo in self.data["repos"]
+
+    def get_repo(self, repo):
+        """
+        Функция получения счетчиков репозитория, создает пустые при отсутствии
+        :param repo: string
+        :return: dict
+        """
+        if repo not in self.data["repos"]:
+            self.data["repos"][repo] = {
+                "commits": {},
+                "stale": [],
+                "pulls": {"open": {}, "closed": {}},
+                "issues": {"open": {}, "closed": {}},
+            }
+        return self.data["repos"][repo]
+
+    def is_delivered(self, delivery):
+        """
+        Функция проверки, применялось ли уже событие
+        :param delivery: string
+        :return: bool
+        """
+        return delivery in self.deliveries
+
+    def add_delivery(self, delivery):
+        """
+        Функция запоминания примененного события. Хранятся последние
+        settings.WEBHOOK_DELIVERY_LIMIT идентификаторов
+        :param delivery: string
+        :return:
+        """
+        lst_deliveries = self.data["deliveries"]
+        lst_deliveries.append(delivery)
+        self.deliveries.add(delivery)
+        while len(lst_deliveries) > settings.WEBHOOK_DELIVERY_LIMIT:
+            self.deliveries.discard(lst_deliveries.pop(0))
+
+
+class EventHandler:
+    """
+    Класс применения событий webhook к счетчикам в виде дельт
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.handlers = {
+            "push": self._push_handler,
+            "pull_request": self._pull_request_handler,
+            "issues": self._issues_handler,
+        }
+
+    def validate(self, event, payload):
+        """
+        Функция проверки наличия в событии полей, нужных для обработки
+        :param event: string
+        :param payload: dict
+        :return: bool
+        """
+        repository = payload.get("repository")
+        if not isinstance(repository, dict) or not isinstance(repository.get("full_name"), str):
+            return False
+        if event == "push":
+            lst_commits = payload.get("commits")
+            if lst_commits is None:
+                lst_commits = []
+            return (
+                isinstance(payload.get("ref"), str)
+                and isinstance(lst_commits, list)
+                and all(isinstance(i, dict) for i in lst_commits)
+                and all(isinstance(i.get("author"), (dict, type(None))) for i in lst_commits)
+            )
+        item = payload.get({"pull_request": "pull_request", "issues": "issue"}[event])
+        return (
+            isinstance(payload.get("action"), str)
+            and isinstance(item, dict)
+            and "number" in item
+            and isinstance(item.get("created_at"), str)
+        )
+
+    def apply(self, event, payload, delivery=None):
+        """
+        Функция применения одного события. Повторно доставленные события пропускаются,
+        без идентификатора доставки событие опознается по хэшу содержимого
+        :param event: string
+        :param payload: dict
+        :param delivery: string or None
+        :return: bool
+        """
+        handler = self.handlers.get(event)
+        if handler is None or not self.validate(event, payload):
+            return False
+        if delivery is None:
+            content = json.dumps([event, payload], sort_keys=True).encode("utf-8")
+            delivery = hashlib.sha256(content).hexdigest()
+        if self.storage.is_delivered(delivery):
+            return False
+        repo = self.storage.get_repo(payload["repository"]["full_name"])
+        handler(repo, payload)
+        self.storage.add_delivery(delivery)
+        return True
+
+    def _push_handler(self, repo, payload):
+        """
+        Обработчик события push, учитывает коммиты авторов в ветке по логину GitHub,
+        коммиты авторов без логина не учитываются, как и в TopContributors.
+        После удаления ветки ее счетчики удаляются. Для новой ветки (история
+        родителя в событие не входит), после force push и при обрезанном
+        до PUSH_COMMITS_LIMIT массиве commits счетчики ветки сбрасываются до сверки
+        :param repo: dict
+        :param payload: dict
+        :return:
+        """
+        ref = payload["ref"]
+        if not ref.startswith("refs/heads/"):
+            return
+        branch = ref[len("refs/heads/"):]
+        lst_commits = payload.get("commits") or []
+        if payload.get("deleted"):
+            repo["commits"].pop(branch, None)
+            if branch in repo["stale"]:
+                repo["stale"].remove(branch)
+            return
+        if payload.get("created") or payload.get("forced") or len(lst_commits) >= PUSH_COMMITS_LIMIT:
+            repo["commits"].pop(branch, None)
+            if branch not in repo["stale"]:
+                repo["stale"].append(branch)
+            return
+        dict_contributors = repo["commits"].setdefault(branch, {})
+        for commit in lst_commits:
+            author = commit.get("author") or {}
+            login = author.get("username")
+            if login is None:
+                continue
+            dict_contributors[login] = dict_contributors.get(login, 0) + 1
+
+    def _pull_request_handler(self, repo, payload):
+        """
+        Обработчик события pull_request
+        :param repo: dict
+        :param payload: dict
+        :return:
+        """
+        self._state_handler(repo["pulls"], payload["action"], payload["pull_request"])
+
+    def _issues_handler(self, repo, payload):
+        """
+        Обработчик события issues
+        :param repo: dict
+        :param payload: dict
+        :return:
+        """
+        action = payload["action"]
+        if action in ("deleted", "transferred"):
+            action = "removed"
+        self._state_handler(repo["issues"], action, payload["issue"])
+
+    def _state_handler(self, counters, action, item):
+        """
+        Функция изменения множеств открытых и закрытых элементов по номеру
+        :param counters: dict
+        :param action: string
+        :param item: dict
+        :return:
+        """
+        number = str(item["number"])
+        if action in ("opened", "reopened"):
+            counters["closed"].pop(number, None)
+            counters["open"][number] = item["created_at"]
+        elif action == "closed":
+            counters["open"].pop(number, None)
+            counters["closed"][number] = item.get("closed_at")
+        elif action == "removed":
+            counters["open"].pop(number, None)
+            counters["closed"].pop(number, None)
+
+
+class WebhookStatistics:
+    """
+    Класс получения статистики из счетчиков без обращения к API
+    """
+
+    def __init__(self, storage, repo, branch="master"):
+        self.storage = storage
+        self.repo = repo
+        self.branch = branch
+
+    def is_stale(self):
+        """
+        Функция проверки, требуют ли счетчики ветки сверки
+        :return: bool
+        """
+        return self.branch in self.storage.get_repo(self.repo)["stale"]
+
+    def get_top_contrib(self):
+        """
+        Функция получения рейтинга контрибьюторов по количеству коммитов
+        :return: list of tuples
+        """
+        commits = self.storage.get_repo(self.repo)["commits"]
+        lst_items = list(commits.get(self.branch, {}).items())
+        lst_items.sort(key=lambda i: i[1], reverse=True)
+        return lst_items
+
+    def get_pulls_statistics(self, border):
+        """
+        Функция получения статистики по pull requests
+        :param border: int
+        :return: tuple
+        """
+        pull_stat = namedtuple("PullStat", "open closed old")
+        return pull_stat(*self._classifier(self.storage.get_repo(self.repo)["pulls"], border))
+
+    def get_issues_statistics(self, border):
+        """
+        Функция получения статистики по issues
+        :param border: int
+        :return: tuple
+        """
+        issue_stat = namedtuple("IssueStat", "open closed old")
+        return issue_stat(*self._classifier(self.storage.get_repo(self.repo)["issues"], border))
+
+    def _classifier(self, counters, border):
+        """
+        Функция классификации открытых элементов по времени создания
+        :param counters: dict
+        :param border: int
+        :return: tuple
+        """
+        border_sec = 3600 * 24 * border
+        float_now_timestamp = datetime.datetime.now().timestamp()
+        old = 0
+        for created in counters["open"].values():
+            d = datetime.datetime.strptime(created, "%Y-%m-%dT%H:%M:%SZ")
+            if float_now_timestamp - d.timestamp() >= border_sec:
+                old += 1
+        return len(counters["open"]), len(counters["closed"]), old
+
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """
+    Класс обработчика http запросов от GitHub
+    """
+
+    handler = None
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_response(400)
+            self.end_headers()
+            return
+        body = self.rfile.read(length)
+        if not self._signature_validator(body):
+            self.send_response(401)
+            self.end_headers()
+            return
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        event = self.headers.get("X-GitHub-Event", "")
+        if not isinstance(payload, dict) or (
+            event in self.handler.handlers and not self.handler.validate(event, payload)
+        ):
+            self.send_response(400)
+            self.end_headers()
+            return
+        with self.handler.storage.transaction():
+            self.handler.apply(event, payload, self.headers.get("X-GitHub-Delivery"))
+        self.send_response(204)
+        self.end_headers()
+
+    def _signature_validator(self, body):
+        """
+        Функция проверки подписи запроса, если задан секрет
+        :param body: bytes
+        :return: bool
+        """
+        if not settings.WEBHOOK_SECRET:
+            return True
+        digest = hmac.new(settings.WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256)
+        expected = "sha256={0}".format(digest.hexdigest())
+        return hmac.compare_digest(expected, self.headers.get("X-Hub-Signature-256", ""))
+
+
+def serve(storage):
+    """
+    Функция запуска локального http сервера приема событий
+    :param storage: WebhookStorage
+    :return:
+    """
+    WebhookRequestHandler.handler = EventHandler(storage)
+    server = HTTPServer((settings.WEBHOOK_HOST, settings.WEBHOOK_PORT), WebhookRequestHandler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def replay(storage, lst_paths):
+    """
+    Функция применения событий из json файлов.
+    Файл содержит объект {"event": ..., "payload": ..., "delivery": ...} или список таких объектов,
+    поле delivery необязательно. Нечитаемые файлы пропускаются
+    :param storage: WebhookStorage
+    :param lst_paths: list of strings
+    :return: int
+    """
+    lst_events = []
+    for path in lst_paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print("Файл {0} пропущен: {1}".format(path, e))
+            continue
+        if isinstance(data, dict):
+            data = [data]
+        if isinstance(data, list):
+            lst_events.extend(data)
+    handler = EventHandler(storage)
+    qty = 0
+    with storage.transaction():
+        for element in lst_events:
+            if not isinstance(element, dict) or not isinstance(element.get("payload"), dict):
+                continue
+            if handler.apply(element.get("event"), element["payload"], element.get("delivery")):
+                qty += 1
+    return qty
+
+
+def reconcile(storage, repo, branch="master"):
+    """
+    Функция сверки счетчиков репозитория с api: открытые и закрытые pull requests и issues
+    и рейтинг контрибьюторов ветки заменяются текущими данными
+    :param storage: WebhookStorage
+    :param repo: string
+    :param branch: string
+    :return:
+    """
+    time = namedtuple("Time", "start stop")(None, None)
+    pulls = analytic.PullsAnalytics(repo, time, branch=branch)
+    issues = analytic.IssueAnalytics(repo, time, branch=branch)
+    contributors = analytic.TopContributors(repo, time, branch=branch)
+    dict_data = {}
+    for key, source in (("pulls", pulls.get_pulls), ("issues", issues.get_issues)):
+        dict_data[key] = {
+            "open": {str(i["number"]): i["created_at"] for i in source("open")},
+            "closed": {str(i["number"]): i.get("closed_at") for i in source("closed")},
+        }
+    dict_contributors = dict(contributors.get_sorted_set())
+    with storage.transaction():
+        counters = storage.get_repo(repo)
+        counters.update(dict_data)
+        counters["commits"][branch] = dict_contributors
+        if branch in counters["stale"]:
+            counters["stale"].remove(branch)
+
+
+def show(storage, repo, branch="master"):
+    """
+    Функция вывода статистики из счетчиков
+    :param storage: WebhookStorage
+    :param repo: string
+    :param branch: string
+    :return:
+    """
+    if not storage.has_repo(repo):
+        print("Нет данных по репозиторию {0}. Выполните webhook.py reconcile".format(repo))
+        return
+    stat = WebhookStatistics(storage, repo, branch)
+    if stat.is_stale():
+        print("!!!Счетчики ветки {0} требуют сверки: webhook.py reconcile".format(branch))
+    elif branch not in storage.get_repo(repo)["commits"]:
+        print("!!!Нет счетчиков ветки {0}. Выполните webhook.py reconcile".format(branch))
+    interface.ConsoleInterface().statistic_render(
+        stat.get_top_contrib(),
+        stat.get_pulls_statistics(settings.PULLS_BORDER),
+        stat.get_issues_statistics(settings.ISSUES_BORDER),
+    )
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "replay" and len(sys.argv) > 2:
+        print("Применено событий: {0}".format(replay(WebhookStorage(), sys.argv[2:])))
+    elif command == "serve" and len(sys.argv) == 2:
+        serve(WebhookStorage())
+    elif command in ("reconcile", "stats") and len(sys.argv) in (3, 4):
+        func = reconcile if command == "reconcile" else show
+        try:
+            func(WebhookStorage(), *sys.argv[2:])
+        except error.InputDataError as e:
+            print(e)
+    else:
+        print(
+            "Использование: webhook.py serve | webhook.py replay <файл.json> ... | "
+            "webhook.py reconcile <owner/repo> [ветка] | webhook.py stats <owner/repo> [ветка]"
+        )